@@ -1,10 +1,16 @@
 import streamlit as st
-import json
+import orjson
 import sqlite3
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import io
-import base64
+import xlsxwriter
+import threading
+import queue
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 import streamlit.components.v1 as components
 
@@ -15,86 +21,218 @@ st.set_page_config(
     layout="wide"
 )
 
+# Absolute paths to the app's files, resolved once at import
+try:
+    APP_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    # Fall back to current working directory
+    APP_DIR = os.getcwd()
+
+DB_PATH = os.path.join(APP_DIR, 'survey_data.db')
+
+# Arabic display names for the survey_responses columns
+DISPLAY_COLUMNS = {
+    "id": "ID",
+    "category": "الفئة",
+    "merchant_name": "اسم التاجر",
+    "timestamp": "التاريخ والوقت",
+    "latitude": "خط العرض",
+    "longitude": "خط الطول"
+}
+
+# Number of pooled connections; under WAL they can all read at the same time
+POOL_SIZE = 4
+
+# Seconds to wait for a free pooled connection before giving up, like SQLite's busy timeout
+POOL_TIMEOUT = 30
+
+# Per-connection settings, applied once when a pooled connection is opened
+CONNECTION_PRAGMAS = '''
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA mmap_size=268435456;
+'''
+
 # Helper functions for database operations
-def get_db_path():
-    """Get absolute path to the database file"""
+def open_connection():
+    """Open a SQLite connection with the app's PRAGMAs applied"""
+    # Wait up to 30s (SQLite's busy_timeout) if another process holds the write lock
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False, isolation_level=None, cached_statements=256)
+    conn.executescript(CONNECTION_PRAGMAS)
+    return conn
+
+def close_pool(pool):
+    """Close every connection left in the pool"""
+    while not pool.empty():
+        pool.get_nowait().close()
+
+@st.cache_resource(on_release=close_pool)
+def get_pool():
+    """Open the connection pool once per process and share it across reruns and sessions"""
+    pool = queue.Queue(maxsize=POOL_SIZE)
+    for _ in range(POOL_SIZE):
+        pool.put(open_connection())
+    return pool
+
+@contextmanager
+def pooled_conn():
+    """Check a connection out of the pool and hand it back when done"""
+    pool = get_pool()
     try:
-        # Try to get the directory of the current file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-    except:
-        # Fall back to current working directory
-        current_dir = os.getcwd()
+        conn = pool.get(timeout=POOL_TIMEOUT)
+    except queue.Empty:
+        # Surface an exhausted pool as a database error, so callers report it like any other
+        raise sqlite3.OperationalError("no database connection became free") from None
     
-    return os.path.join(current_dir, 'survey_data.db')
+    try:
+        yield conn
+    finally:
+        # Never hand back a connection with a transaction still open
+        if conn.in_transaction:
+            conn.rollback()
+        pool.put(conn)
+
+@st.cache_resource
+def get_db_lock():
+    """Lock serializing writers across sessions; SQLite allows only one at a time"""
+    return threading.Lock()
 
 def execute_query(query, params=None, fetch=False):
     """Execute a SQL query safely with proper error handling"""
-    conn = None
     result = None
     
+    # Only statements that write need the writer lock
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-            
-        if fetch:
-            result = cursor.fetchall()
-        else:
-            conn.commit()
-            result = cursor.lastrowid
+        with pooled_conn() as conn, (nullcontext() if fetch else get_db_lock()):
+            cursor = conn.cursor()
             
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+                
+            if fetch:
+                result = cursor.fetchall()
+            else:
+                result = cursor.lastrowid
+                
     except sqlite3.Error as e:
+        # pooled_conn rolls back anything left open before the connection goes back
         st.error(f"Database error: {e}")
-        if conn:
-            conn.rollback()
         return None
-        
-    finally:
-        if conn:
-            conn.close()
             
     return result
 
+def read_dataframe(query, params=None, **kwargs):
+    """Run a SELECT and load the result straight into a dataframe"""
+    try:
+        with pooled_conn() as conn:
+            return pd.read_sql_query(query, conn, params=params, **kwargs)
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        st.error(f"Database error: {e}")
+        return None
+
+# Database schema; every statement is idempotent and they all commit together
+SCHEMA_SQL = '''
+BEGIN;
+CREATE TABLE IF NOT EXISTS survey_responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category TEXT NOT NULL,
+    merchant_name TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    latitude TEXT,
+    longitude TEXT
+);
+
+CREATE TABLE IF NOT EXISTS survey_answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    response_id INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    FOREIGN KEY (response_id) REFERENCES survey_responses (id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_answers_response_id ON survey_answers (response_id);
+CREATE INDEX IF NOT EXISTS idx_responses_category_id ON survey_responses (category, id DESC);
+CREATE INDEX IF NOT EXISTS idx_responses_merchant_id ON survey_responses (merchant_name, id);
+COMMIT;
+'''
+
+# Refresh the query planner's index statistics; analysis_limit samples each
+# index instead of scanning it, so this stays cheap on a large database
+ANALYZE_SQL = '''
+PRAGMA analysis_limit=1000;
+ANALYZE;
+'''
+
+# Older databases stored timestamps as local-time TEXT; rebuild the table
+# with an INTEGER epoch column (SQLite cannot change a column's type in place).
+# The AUTOINCREMENT counter is moved over to the new table before the DROP
+# would delete it, so ids of already-deleted responses are never reused.
+# init_database runs these statements one by one inside its own transaction;
+# only TEXT values are converted, so replaying them can't mangle an epoch
+MIGRATE_TIMESTAMP_SQL = '''
+CREATE TABLE survey_responses_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category TEXT NOT NULL,
+    merchant_name TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    latitude TEXT,
+    longitude TEXT
+);
+INSERT INTO survey_responses_new (id, category, merchant_name, timestamp, latitude, longitude)
+    SELECT id, category, merchant_name,
+           CASE WHEN typeof(timestamp) = 'text' THEN CAST(strftime('%s', timestamp, 'utc') AS INTEGER) ELSE timestamp END,
+           latitude, longitude
+    FROM survey_responses;
+UPDATE sqlite_sequence
+    SET seq = (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('survey_responses', 'survey_responses_new'))
+    WHERE name = 'survey_responses';
+DELETE FROM sqlite_sequence WHERE name = 'survey_responses_new';
+UPDATE sqlite_sequence SET name = 'survey_responses_new' WHERE name = 'survey_responses';
+DROP TABLE survey_responses;
+ALTER TABLE survey_responses_new RENAME TO survey_responses
+'''
+
+@st.cache_resource
 def init_database():
-    """Create database tables if they don't exist"""
-    # Create survey_responses table with merchant_name field and location fields
-    execute_query('''
-    CREATE TABLE IF NOT EXISTS survey_responses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        category TEXT NOT NULL,
-        merchant_name TEXT NOT NULL,
-        timestamp TEXT NOT NULL,
-        latitude TEXT,
-        longitude TEXT
-    )
-    ''')
-    
-    # Create survey_answers table
-    execute_query('''
-    CREATE TABLE IF NOT EXISTS survey_answers (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        response_id INTEGER NOT NULL,
-        question TEXT NOT NULL,
-        answer TEXT NOT NULL,
-        FOREIGN KEY (response_id) REFERENCES survey_responses (id)
-    )
-    ''')
-    
-    # Test if we can insert and retrieve data
-    test_connection()
+    """Create database tables if they don't exist (once per process)"""
+    try:
+        with pooled_conn() as conn, get_db_lock():
+            # Migrate first so the indexes below are built on the rebuilt table. Take the
+            # write lock before checking the column type, so another process starting
+            # on the same database can't migrate it between the check and the rebuild
+            conn.execute("BEGIN IMMEDIATE")
+            columns = conn.execute("PRAGMA table_info(survey_responses)").fetchall()
+            if any(col[1] == "timestamp" and col[2] == "TEXT" for col in columns):
+                # executescript would commit the open transaction first, so run each statement
+                for statement in MIGRATE_TIMESTAMP_SQL.split(";"):
+                    conn.execute(statement)
+            conn.execute("COMMIT")
+            
+            conn.executescript(SCHEMA_SQL)
+            conn.executescript(ANALYZE_SQL)
+    except sqlite3.Error as e:
+        # pooled_conn has rolled back; raise rather than return, so cache_resource doesn't
+        # keep the failure and the next run retries (e.g. after a busy lock is released)
+        st.error(f"Database error: {e}")
+        raise
+            
+    return True
 
-def test_connection():
-    """Test if we can write to and read from the database"""
+def test_connection(deep=False):
+    """Test if we can reach the database, and with deep=True also write to it"""
+    if not deep:
+        # A single read is enough to show the database answers
+        return execute_query("SELECT 1", fetch=True) == [(1,)]
+    
     try:
         # Test insert
         execute_query(
             "INSERT INTO survey_responses (category, merchant_name, timestamp, latitude, longitude) VALUES (?, ?, ?, ?, ?)",
-            ("Test Category", "Test Merchant", "2023-01-01 00:00:00", "0.0", "0.0")
+            ("Test Category", "Test Merchant", 0, "0.0", "0.0")
         )
         
         # Test select
@@ -116,281 +254,449 @@ def test_connection():
         return False
 
 def save_survey(category, merchant_name, answers, latitude=None, longitude=None):
-    """Save a survey response to the database"""
-    # First insert the survey response
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    response_id = execute_query(
-        "INSERT INTO survey_responses (category, merchant_name, timestamp, latitude, longitude) VALUES (?, ?, ?, ?, ?)",
-        (category, merchant_name, timestamp, latitude, longitude)
-    )
+    """Save a survey response and its answers in a single transaction"""
+    timestamp = int(time.time())
     
-    if response_id:
-        # Then insert all the answers
-        for question, answer in answers.items():
-            execute_query(
+    try:
+        with pooled_conn() as conn, get_db_lock():
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # First insert the survey response
+            cursor.execute(
+                "INSERT INTO survey_responses (category, merchant_name, timestamp, latitude, longitude) VALUES (?, ?, ?, ?, ?)",
+                (category, merchant_name, timestamp, latitude, longitude)
+            )
+            response_id = cursor.lastrowid
+            
+            # Then insert all the answers in one batch
+            cursor.executemany(
                 "INSERT INTO survey_answers (response_id, question, answer) VALUES (?, ?, ?)",
-                (response_id, question, answer)
+                [(response_id, question, answer) for question, answer in answers.items()]
             )
-        return response_id
-    return None
+            cursor.execute("COMMIT")
+            
+    except sqlite3.Error as e:
+        # pooled_conn rolls back the half-written response before the connection goes back
+        st.error(f"Database error: {e}")
+        return None
+    
+    return response_id
 
 def get_recent_responses(limit=10):
-    """Get recent survey responses"""
-    result = execute_query(
-        f"SELECT id, category, merchant_name, timestamp, latitude, longitude FROM survey_responses ORDER BY id DESC LIMIT {limit}",
-        fetch=True
+    """Get recent survey responses as a dataframe"""
+    # Read the columns straight into Arrow-backed dtypes, which st.dataframe ships as-is
+    return read_dataframe(
+        "SELECT id, category, merchant_name, datetime(timestamp, 'unixepoch', 'localtime') AS timestamp, latitude, longitude FROM survey_responses ORDER BY id DESC LIMIT ?",
+        (limit,),
+        dtype_backend="pyarrow"
     )
-    
-    if result:
-        return [{"id": row[0], "category": row[1], "merchant_name": row[2], "timestamp": row[3], "latitude": row[4], "longitude": row[5]} for row in result]
-    return []
 
 def get_response_details(response_id):
     """Get details for a specific response"""
-    # Get response info
-    response_info = execute_query(
-        "SELECT category, merchant_name, timestamp, latitude, longitude FROM survey_responses WHERE id = ?",
+    # Fetch the response and its answers in one JOIN
+    rows = execute_query(
+        """
+        SELECT r.category, r.merchant_name, datetime(r.timestamp, 'unixepoch', 'localtime'),
+               r.latitude, r.longitude, a.question, a.answer
+        FROM survey_responses r
+        LEFT JOIN survey_answers a ON a.response_id = r.id
+        WHERE r.id = ?
+        ORDER BY a.id
+        """,
         (response_id,),
         fetch=True
     )
     
-    if not response_info:
+    # None means the query failed; an unknown id is an empty dict
+    if rows is None:
         return None
-        
-    # Get answers
-    answers_result = execute_query(
-        "SELECT question, answer FROM survey_answers WHERE response_id = ?",
-        (response_id,),
-        fetch=True
-    )
+    if not rows:
+        return {}
     
-    answers = {row[0]: row[1] for row in answers_result} if answers_result else {}
+    category, merchant_name, timestamp, latitude, longitude = rows[0][:5]
     
     return {
         "id": response_id,
-        "category": response_info[0][0],
-        "merchant_name": response_info[0][1],
-        "timestamp": response_info[0][2],
-        "latitude": response_info[0][3],
-        "longitude": response_info[0][4],
-        "answers": answers
+        "category": category,
+        "merchant_name": merchant_name,
+        "timestamp": timestamp,
+        "latitude": latitude,
+        "longitude": longitude,
+        # A response without answers comes back as one row with NULL question/answer
+        "answers": {row[5]: row[6] for row in rows if row[5] is not None}
     }
 
-def get_all_survey_data():
-    """Get all survey data for export in a structured format"""
-    # Get all survey responses
-    responses = execute_query(
-        "SELECT id, category, merchant_name, timestamp, latitude, longitude FROM survey_responses",
+def get_all_survey_data(category=None, merchant_name=None):
+    """Get all survey data (optionally for one category or merchant) for export in a structured format"""
+    # Filter in SQL so only the matching responses are read
+    filters = {"r.category": category, "r.merchant_name": merchant_name}
+    conditions = [f"{column} = ?" for column, value in filters.items() if value is not None]
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    params = tuple(value for value in filters.values() if value is not None) or None
+    
+    # Group the flat JOIN rows back into one dict per response
+    all_data = []
+    
+    try:
+        with pooled_conn() as conn:
+            # Iterate the cursor instead of fetchall() so the flat rows are never held as a list
+            rows = conn.execute(
+                f"""
+                SELECT r.id, r.category, r.merchant_name, datetime(r.timestamp, 'unixepoch', 'localtime'),
+                       r.latitude, r.longitude, a.question, a.answer
+                FROM survey_responses r
+                LEFT JOIN survey_answers a ON a.response_id = r.id
+                {where}
+                ORDER BY r.id, a.id
+                """,
+                params or ()
+            )
+            
+            for response_id, category, merchant_name, timestamp, latitude, longitude, question, answer in rows:
+                if not all_data or all_data[-1]["id"] != response_id:
+                    all_data.append({
+                        "id": response_id,
+                        "category": category,
+                        "merchant_name": merchant_name,
+                        "timestamp": timestamp,
+                        "latitude": latitude,
+                        "longitude": longitude,
+                        "answers": {}
+                    })
+                
+                # Responses without answers come back with NULL question/answer
+                if question is not None:
+                    all_data[-1]["answers"][question] = answer
+    except sqlite3.Error as e:
+        st.error(f"Database error: {e}")
+        return None
+    
+    return all_data
+
+def get_survey_categories():
+    """Get the distinct categories that have saved responses"""
+    result = execute_query(
+        "SELECT DISTINCT category FROM survey_responses ORDER BY category",
+        fetch=True
+    )
+    return None if result is None else [row[0] for row in result]
+
+def get_survey_merchants():
+    """Get the distinct merchant names that have saved responses"""
+    result = execute_query(
+        "SELECT DISTINCT merchant_name FROM survey_responses ORDER BY merchant_name",
         fetch=True
     )
+    return None if result is None else [row[0] for row in result]
+
+def merge_answers(responses, answers, questions=None):
+    """Pivot long-form answers to one column per question and join them onto the responses"""
+    # Keep questions in the order they were first answered, unless a column order is given
+    wide = answers.pivot(index="response_id", columns="question", values="answer")
+    wide = wide.reindex(columns=answers["question"].unique() if questions is None else questions)
+    
+    df = responses.merge(wide, left_on="id", right_index=True, how="left")
+    
+    # Category and merchant names repeat down the rows; categoricals store each one once
+    df = df.astype({"category": "category", "merchant_name": "category"})
+    return df.rename(columns=DISPLAY_COLUMNS)
+
+def get_survey_dataframe():
+    """Get all survey data as one flattened dataframe, one column per question"""
+    responses = read_dataframe(
+        "SELECT id, category, merchant_name, datetime(timestamp, 'unixepoch', 'localtime') AS timestamp, latitude, longitude FROM survey_responses ORDER BY id"
+    )
+    answers = read_dataframe(
+        "SELECT response_id, question, answer FROM survey_answers ORDER BY id"
+    )
     
-    if not responses:
+    if responses is None or answers is None:
         return None
     
-    # Prepare data structure
-    all_data = []
-    
-    for response in responses:
-        response_id, category, merchant_name, timestamp, latitude, longitude = response
+    return merge_answers(responses, answers)
+
+# Number of responses read per chunk when streaming a full export
+EXPORT_CHUNKSIZE = 10000
+
+def iter_survey_dataframes(chunksize=EXPORT_CHUNKSIZE):
+    """Yield the flattened survey data a chunk of responses at a time, with the same columns in every chunk"""
+    with pooled_conn() as conn:
+        # Read every chunk from one snapshot so concurrent saves can't shift the export
+        conn.execute("BEGIN")
         
-        # Get answers for this response
-        answers_result = execute_query(
-            "SELECT question, answer FROM survey_answers WHERE response_id = ?",
-            (response_id,),
-            fetch=True
-        )
+        # Fix the question columns up front so every chunk lines up with the header
+        questions = [row[0] for row in conn.execute(
+            "SELECT question FROM survey_answers GROUP BY question ORDER BY MIN(id)"
+        )]
         
-        answers = {row[0]: row[1] for row in answers_result} if answers_result else {}
+        chunks = pd.read_sql_query(
+            "SELECT id, category, merchant_name, datetime(timestamp, 'unixepoch', 'localtime') AS timestamp, latitude, longitude FROM survey_responses ORDER BY id",
+            conn,
+            chunksize=chunksize
+        )
+        for responses in chunks:
+            # Only the answers belonging to this chunk's id range
+            answers = pd.read_sql_query(
+                "SELECT response_id, question, answer FROM survey_answers WHERE response_id BETWEEN ? AND ? ORDER BY id",
+                conn,
+                params=(int(responses["id"].iloc[0]), int(responses["id"].iloc[-1]))
+            )
+            yield merge_answers(responses, answers, questions)
         
-        # Add to data structure
-        all_data.append({
-            "id": response_id,
-            "category": category,
-            "merchant_name": merchant_name,
-            "timestamp": timestamp,
-            "latitude": latitude,
-            "longitude": longitude,
-            "answers": answers
-        })
-    
-    return all_data
+        conn.execute("COMMIT")
+
+# Cached readers; the data version changes whenever a response is added or removed
+def get_data_version():
+    """Get a cheap (count, max id) fingerprint of the saved responses"""
+    result = execute_query(
+        "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM survey_responses",
+        fetch=True
+    )
+    return result[0] if result else (0, 0)
+
+class DatabaseReadError(RuntimeError):
+    """A cached read failed; the reader has already shown the error with st.error"""
+
+def checked(result):
+    """Raise if a read failed, so st.cache_data doesn't keep the failure until the next save"""
+    if result is None:
+        raise DatabaseReadError("Database read failed")
+    return result
+
+# Each save bumps the version, so only the current version's entries are kept;
+# loaders that are also keyed by a filter keep a few entries per version
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_recent_responses(limit, version):
+    """Cached get_recent_responses for a given data version"""
+    return checked(get_recent_responses(limit))
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_response_details(response_id, version):
+    """Cached get_response_details for a given data version"""
+    return checked(get_response_details(response_id))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_all_survey_data(version, category=None, merchant_name=None):
+    """Cached get_all_survey_data for a given data version"""
+    return checked(get_all_survey_data(category, merchant_name))
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_survey_categories(version):
+    """Cached get_survey_categories for a given data version"""
+    return checked(get_survey_categories())
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_survey_merchants(version):
+    """Cached get_survey_merchants for a given data version"""
+    return checked(get_survey_merchants())
 
-# Download helpers
-def create_download_link(df, filename, text):
-    """Create a download link for a dataframe"""
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">📥 {text}</a>'
-    return href
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_survey_dataframe(version):
+    """Cached get_survey_dataframe for a given data version"""
+    return checked(get_survey_dataframe())
 
-def create_excel_download_link(df, filename, text):
-    """Create a download link for an Excel file"""
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_filtered_dataframe(version, category=None, merchant_name=None):
+    """Cached flattened dataframe for one category or merchant at a given data version"""
+    return prepare_survey_dataframe(load_all_survey_data(version, category, merchant_name))
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_survey_csv(version):
+    """Cached export_survey_csv for a given data version"""
+    return export_survey_csv()
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_survey_excel(version):
+    """Cached export_survey_excel for a given data version"""
+    return export_survey_excel()
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_survey_json(version):
+    """Cached export_survey_json for a given data version"""
+    return export_survey_json()
+
+# Download helpers; each button gets a callable so the file is only built when it
+# is clicked, and on_click="ignore" keeps a download from rerunning the script
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+def csv_download_button(df, filename, text):
+    """Create a download button for a dataframe as CSV"""
+    st.download_button(f"📥 {text}", lambda: csv_bytes(df), file_name=filename, mime="text/csv", on_click="ignore")
+
+# Excel only reads a CSV as UTF-8 (rather than the local code page) when it starts with a BOM
+UTF8_BOM = b"\xef\xbb\xbf"
+
+def write_csv(df, sink, header=True):
+    """Write a dataframe as CSV to a pyarrow stream with Arrow's C++ writer"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pa_csv.write_csv(table, sink, pa_csv.WriteOptions(include_header=header))
+
+def csv_bytes(df):
+    """Serialize a dataframe to CSV bytes"""
+    sink = pa.BufferOutputStream()
+    sink.write(UTF8_BOM)
+    write_csv(df, sink)
+    return sink.getvalue().to_pybytes()
+
+def excel_download_button(df, filename, text):
+    """Create a download button for a dataframe as an Excel file"""
+    st.download_button(f"📥 {text}", lambda: excel_bytes(df), file_name=filename, mime=EXCEL_MIME, on_click="ignore")
+
+def excel_bytes(df):
+    """Write a dataframe to an in-memory Excel workbook"""
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Data')
-    excel_data = output.getvalue()
-    b64 = base64.b64encode(excel_data).decode()
-    href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{filename}">📥 {text}</a>'
-    return href
-
-def create_json_download_link(data, filename, text):
-    """Create a download link for JSON data"""
-    json_str = json.dumps(data, ensure_ascii=False, indent=2)
-    b64 = base64.b64encode(json_str.encode('utf-8')).decode()
-    href = f'<a href="data:file/json;base64,{b64}" download="{filename}">📥 {text}</a>'
-    return href
+    # constant_memory flushes each row as it is written, so rows must go out in order
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Data')
+    worksheet.write_row(0, 0, [str(col) for col in df.columns])
+    write_excel_rows(worksheet, df, 1)
+    workbook.close()
+    return output.getvalue()
+
+def write_excel_rows(worksheet, df, first_row):
+    """Write a dataframe's rows to a worksheet in order, leaving missing values as empty cells"""
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    for row_num, row in enumerate(rows, start=first_row):
+        worksheet.write_row(row_num, 0, row)
+    return first_row + len(df)
+
+def parquet_download_button(df, filename, text):
+    """Create a download button for a dataframe as a Parquet file"""
+    st.download_button(f"📥 {text}", lambda: df.to_parquet(index=False, compression="zstd"), file_name=filename, mime="application/vnd.apache.parquet", on_click="ignore")
+
+def feather_download_button(df, filename, text):
+    """Create a download button for a dataframe as a Feather file"""
+    st.download_button(f"📥 {text}", lambda: feather_bytes(df), file_name=filename, mime="application/vnd.apache.arrow.file", on_click="ignore")
+
+def feather_bytes(df):
+    """Serialize a dataframe to zstd-compressed Feather bytes"""
+    output = io.BytesIO()
+    df.to_feather(output, compression="zstd")
+    return output.getvalue()
+
+def json_download_button(data, filename, text):
+    """Create a download button for JSON data"""
+    st.download_button(
+        f"📥 {text}",
+        lambda: orjson.dumps(data, option=JSON_OPTIONS),
+        file_name=filename,
+        mime="application/json",
+        on_click="ignore"
+    )
+
+# Full exports; chunks are written as they are read so the whole table is never held at once
+def export_survey_csv():
+    """Stream every survey response into CSV bytes"""
+    sink = pa.BufferOutputStream()
+    sink.write(UTF8_BOM)
+    for i, chunk in enumerate(iter_survey_dataframes()):
+        write_csv(chunk, sink, header=i == 0)
+    return sink.getvalue().to_pybytes()
+
+def export_survey_excel():
+    """Stream every survey response into Excel bytes"""
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Data')
+    row_num = 0
+    
+    for chunk in iter_survey_dataframes():
+        if row_num == 0:
+            worksheet.write_row(0, 0, [str(col) for col in chunk.columns])
+            row_num = 1
+        row_num = write_excel_rows(worksheet, chunk, row_num)
+    
+    workbook.close()
+    return output.getvalue()
+
+def export_survey_json():
+    """Serialize every survey response into JSON bytes"""
+    return orjson.dumps(checked(get_all_survey_data()), option=JSON_OPTIONS)
 
 def prepare_survey_dataframe(data):
     """Prepare a flattened dataframe from survey data"""
-    # Start with basic info
-    rows = []
-    
-    for item in data:
-        row = {
-            "ID": item["id"],
-            "الفئة": item["category"],
-            "اسم التاجر": item["merchant_name"],
-            "التاريخ والوقت": item["timestamp"],
-            "خط العرض": item["latitude"],
-            "خط الطول": item["longitude"]
-        }
-        
-        # Add all answers
-        for question, answer in item["answers"].items():
-            row[question] = answer
-        
-        rows.append(row)
+    # Build response and long-form answer frames, then let pandas do the reshape
+    responses = pd.DataFrame(
+        [[item[column] for column in DISPLAY_COLUMNS] for item in data],
+        columns=list(DISPLAY_COLUMNS)
+    )
+    answers = pd.DataFrame(
+        [(item["id"], question, answer) for item in data for question, answer in item["answers"].items()],
+        columns=["response_id", "question", "answer"]
+    )
     
-    return pd.DataFrame(rows)
+    return merge_answers(responses, answers)
 
-# Function to load the JSON data
-@st.cache_data
-def load_data():
+def response_dataframe(response):
+    """Build a one-row dataframe for a single response, one column per question"""
+    # Assemble the whole row first so pandas builds the frame in one go
+    row = {label: response[column] for column, label in DISPLAY_COLUMNS.items()}
+    row.update(response["answers"])
+    return pd.DataFrame([row])
+
+def get_data_mtime():
+    """Get data.json's modification time, so editing the file invalidates the caches below"""
     try:
-        with open('data.json', 'r', encoding='utf-8') as file:
-            return json.load(file)
+        return os.path.getmtime('data.json')
+    except OSError:
+        return 0
+
+# Function to load the JSON data; it is read-only config, so cache_resource
+# shares the parsed dict instead of unpickling a copy on every rerun
+@st.cache_resource(max_entries=1)
+def load_data(mtime):
+    try:
+        with open('data.json', 'rb') as file:
+            return orjson.loads(file.read())
     except FileNotFoundError:
         st.error("Error: data.json file not found in the current directory.")
         return {"business_categories": []}
 
-# Function to get geolocation
+# Index categories by name once; cache_resource hands back the same dict
+# instead of copying it on every rerun like cache_data would
+@st.cache_resource(max_entries=1)
+def category_index(_data, mtime):
+    """Map each category name to its data"""
+    return {category["category"]: category for category in _data["business_categories"]}
+
+@st.cache_resource(max_entries=1)
+def get_categories(_data, mtime):
+    """Get the category names in data.json order"""
+    return tuple(category_index(_data, mtime))
+
+# Geolocation widget; a static bidirectional component served from ./frontend,
+# so its frame mounts once and sends the coordinates back as its value
+@st.cache_resource
+def geolocation_component():
+    """Declare the geolocation component once per process"""
+    return components.declare_component("geolocation", path=os.path.join(APP_DIR, "frontend"))
+
+def store_location():
+    """Copy a newly captured location from the component into session state"""
+    location = st.session_state.geolocation
+    if location:
+        # The component sends its value as a compact "lat,lng" string
+        latitude, longitude = location.split(",")
+        st.session_state.latitude = latitude
+        st.session_state.longitude = longitude
+
+# Location picker, rendered as a fragment so a capture only reruns this block;
+# the coordinates live in session state for the survey form to pick up
+@st.fragment
 def get_location():
     """Get user's geolocation using HTML component"""
     # Create container for location info
-    location_container = st.empty()
+    location_container = st.container()
     
-    # Create HTML component with geolocation functionality
-    geolocation_html = """
-    <div style="margin-bottom: 10px;">
-        <button 
-            id="get-location-btn" 
-            style="background-color: #0366d6; color: white; padding: 10px 16px; 
-                   border: none; border-radius: 4px; cursor: pointer; font-weight: bold;"
-            onclick="getLocation()">
-            📍 تحديد الموقع الحالي
-        </button>
-        <div id="location-status" style="margin-top: 8px; font-size: 14px;"></div>
-    </div>
+    # Render the component; a capture reruns the fragment with the new value
+    high_accuracy = st.checkbox("تحديد موقع دقيق (GPS)", key="high_accuracy_location")
+    geolocation_component()(high_accuracy=high_accuracy, key="geolocation", default=None, on_change=store_location)
+    latitude = st.session_state.get('latitude')
+    longitude = st.session_state.get('longitude')
     
-    <script>
-    function getLocation() {
-        // Update status
-        document.getElementById('location-status').innerHTML = 
-            '<div style="padding: 8px; background-color: #e3f2fd; border-radius: 4px; text-align: right;">جاري تحديد الموقع...</div>';
-        
-        if (navigator.geolocation) {
-            navigator.geolocation.getCurrentPosition(
-                function(position) {
-                    // Success - get coordinates
-                    const lat = position.coords.latitude;
-                    const lng = position.coords.longitude;
-                    
-                    // Save to local storage
-                    localStorage.setItem('survey_latitude', lat);
-                    localStorage.setItem('survey_longitude', lng);
-                    
-                    // Update status display
-                    document.getElementById('location-status').innerHTML = 
-                        '<div style="padding: 8px; background-color: #e8f5e9; border-radius: 4px; text-align: right;">' +
-                        'تم تحديد الموقع بنجاح! خط العرض: ' + lat + ', خط الطول: ' + lng + '</div>';
-                    
-                    // Submit coordinates to Streamlit via URL parameters and reload
-                    const url = new URL(window.location.href);
-                    url.searchParams.set('lat', lat);
-                    url.searchParams.set('lng', lng);
-                    window.location.href = url.toString();
-                },
-                function(error) {
-                    // Handle errors
-                    let errorMessage = 'حدث خطأ أثناء محاولة تحديد الموقع.';
-                    switch(error.code) {
-                        case error.PERMISSION_DENIED:
-                            errorMessage = 'تم رفض إذن الوصول إلى الموقع.';
-                            break;
-                        case error.POSITION_UNAVAILABLE:
-                            errorMessage = 'معلومات الموقع غير متاحة.';
-                            break;
-                        case error.TIMEOUT:
-                            errorMessage = 'انتهت مهلة طلب الموقع.';
-                            break;
-                    }
-                    document.getElementById('location-status').innerHTML = 
-                        '<div style="padding: 8px; background-color: #ffebee; border-radius: 4px; text-align: right;">' +
-                        errorMessage + '</div>';
-                }
-            );
-        } else {
-            document.getElementById('location-status').innerHTML = 
-                '<div style="padding: 8px; background-color: #ffebee; border-radius: 4px; text-align: right;">' +
-                'المتصفح لا يدعم خدمة تحديد الموقع.</div>';
-        }
-    }
-    
-    // Check if we have coordinates in localStorage when page loads
-    document.addEventListener('DOMContentLoaded', function() {
-        const urlParams = new URLSearchParams(window.location.search);
-        if (urlParams.has('lat') && urlParams.has('lng')) {
-            // We have coordinates from URL
-            const lat = urlParams.get('lat');
-            const lng = urlParams.get('lng');
-            document.getElementById('location-status').innerHTML = 
-                '<div style="padding: 8px; background-color: #e8f5e9; border-radius: 4px; text-align: right;">' +
-                'تم تحديد الموقع بنجاح! خط العرض: ' + lat + ', خط الطول: ' + lng + '</div>';
-        } else {
-            // Check localStorage
-            const lat = localStorage.getItem('survey_latitude');
-            const lng = localStorage.getItem('survey_longitude');
-            if (lat && lng) {
-                document.getElementById('location-status').innerHTML = 
-                    '<div style="padding: 8px; background-color: #e8f5e9; border-radius: 4px; text-align: right;">' +
-                    'تم تحديد الموقع سابقًا! خط العرض: ' + lat + ', خط الطول: ' + lng + '</div>';
-            }
-        }
-    });
-    </script>
-    """
-    
-    # Render HTML component
-    components.html(geolocation_html, height=100)
-    
-    # Check URL parameters for coordinates
-    query_params = st.experimental_get_query_params()
-    latitude = None
-    longitude = None
-    
-    if 'lat' in query_params and 'lng' in query_params:
-        latitude = query_params['lat'][0]
-        longitude = query_params['lng'][0]
-        
-        # Store in session state
-        st.session_state.latitude = latitude
-        st.session_state.longitude = longitude
-        
-        # Clear URL parameters
-        cleaned_params = {k: v for k, v in query_params.items() if k not in ['lat', 'lng']}
-        st.experimental_set_query_params(**cleaned_params)
-        
+    if latitude and longitude:
         # Show map with location
         with location_container:
             st.success(f"تم تحديد الموقع: خط العرض: {latitude}, خط الطول: {longitude}")
@@ -422,26 +728,109 @@ def get_location():
                     if -90 <= lat_float <= 90 and -180 <= lng_float <= 180:
                         st.session_state.latitude = manual_lat
                         st.session_state.longitude = manual_lng
-                        st.experimental_rerun()
+                        st.rerun()
                     else:
                         st.error("قيم غير صالحة للإحداثيات. يجب أن يكون خط العرض بين -90 و 90، وخط الطول بين -180 و 180.")
                 except ValueError:
                     st.error("يرجى إدخال أرقام صالحة للإحداثيات.")
+
+# Survey form, rendered as a fragment so submitting only reruns this block
+@st.fragment
+def render_survey(category_data, merchant_name):
+    """Render the questions form for a category and save it on submit"""
+    category = category_data["category"]
     
-    return latitude, longitude
+    # Create a form
+    with st.form(key='survey_form'):
+        # Display each question with its options
+        for i, q in enumerate(category_data["questions"]):
+            # Display the question as the radio's own label, keyed for lookup on submit
+            st.radio(
+                f"**{i+1}. {q['question']}**",
+                q["options"],
+                key=f"question_{i}"
+            )
+        
+        # Submit button
+        submit_button = st.form_submit_button("حفظ الإجابات")
+    
+    # Handle the submission outside the form, since download buttons can't live in one
+    if submit_button:
+        # Collect the answers from the widget state only when submitting
+        answers = {
+            q["question"]: st.session_state[f"question_{i}"]
+            for i, q in enumerate(category_data["questions"])
+        }
+        
+        # Validate merchant name
+        if not merchant_name:
+            st.error("يرجى إدخال اسم التاجر")
+        else:
+            # Get latest location data from session state
+            lat = st.session_state.get('latitude')
+            lng = st.session_state.get('longitude')
+            
+            # Save to database
+            response_id = save_survey(category, merchant_name, answers, lat, lng)
+            
+            if response_id:
+                st.success(f"تم حفظ الإجابات بنجاح في قاعدة البيانات برقم: {response_id}")
+                
+                # Display the answers
+                st.subheader("الإجابات المقدمة:")
+                st.write(f"**اسم التاجر:** {merchant_name}")
+                
+                # Display location if available
+                if lat and lng:
+                    st.write(f"**الموقع:** خط العرض: {lat}, خط الطول: {lng}")
+                    
+                    # Display map if coordinates are available
+                    st.map(pd.DataFrame({'lat': [float(lat)], 'lon': [float(lng)]}))
+                
+                # Render all answers as a single markdown element
+                st.markdown("\n\n".join(f"**{question}:** {answer}" for question, answer in answers.items()))
+                
+                # Create download buttons for this survey
+                st.subheader("تحميل هذا الاستبيان:")
+                
+                # Prepare data
+                response_data = {
+                    "id": response_id,
+                    "category": category,
+                    "merchant_name": merchant_name,
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "latitude": lat,
+                    "longitude": lng,
+                    "answers": answers
+                }
+                
+                # Filename stem shared by both downloads
+                file_stem = f"survey_{response_id}_{category.replace(' ', '_')}"
+                
+                # Create JSON download
+                json_filename = f"{file_stem}.json"
+                json_download_button(response_data, json_filename, "تحميل كملف JSON")
+                
+                # Create Excel download
+                df = response_dataframe(response_data)
+                excel_filename = f"{file_stem}.xlsx"
+                excel_download_button(df, excel_filename, "تحميل كملف Excel")
+            else:
+                st.error("حدث خطأ أثناء حفظ الإجابات. يرجى المحاولة مرة أخرى.")
 
 # Initialize the database
 init_database()
 
-# Load the data
-data = load_data()
+# Load the data, reloading it whenever data.json changes
+data_mtime = get_data_mtime()
+data = load_data(data_mtime)
 
 # Sidebar navigation
 st.sidebar.title("القائمة")
 page = st.sidebar.radio("اختر الصفحة", ["الاستبيان", "عرض النتائج السابقة", "تحميل البيانات"])
 
 # Extract categories
-categories = [category["category"] for category in data["business_categories"]]
+categories = get_categories(data, data_mtime)
 
 # Add information to sidebar
 with st.sidebar:
@@ -451,7 +840,7 @@ with st.sidebar:
     
     # Database path info
     if st.checkbox("عرض معلومات قاعدة البيانات"):
-        st.code(f"مسار قاعدة البيانات: {get_db_path()}")
+        st.code(f"مسار قاعدة البيانات: {DB_PATH}")
         
         # Test database connection
         if st.button("اختبار الاتصال بقاعدة البيانات"):
@@ -474,110 +863,15 @@ if page == "الاستبيان":
     # Get location
     st.subheader("تحديد الموقع")
     st.markdown("يمكنك تحديد الموقع الحالي لحفظه مع الاستبيان.")
-    latitude, longitude = get_location()
+    get_location()
     
     # Find the selected category data
-    selected_category_data = next(
-        (category for category in data["business_categories"] if category["category"] == selected_category),
-        None
-    )
+    selected_category_data = category_index(data, data_mtime).get(selected_category)
 
     if selected_category_data:
         st.subheader(f"أسئلة عن: {selected_category_data['category']}")
         
-        # Create a form
-        with st.form(key='survey_form'):
-            # Dictionary to store answers
-            answers = {}
-            
-            # Display each question with its options
-            for i, q in enumerate(selected_category_data["questions"]):
-                question = q["question"]
-                options = q["options"]
-                
-                # Create a unique key for each radio button
-                key = f"question_{i}"
-                
-                # Display the question and options
-                st.write(f"**{i+1}. {question}**")
-                answer = st.radio(
-                    "اختر إجابة",
-                    options,
-                    key=key,
-                    label_visibility="collapsed"
-                )
-                
-                # Add to answers dictionary
-                answers[question] = answer
-                
-                # Add a separator
-                st.divider()
-            
-            # Submit button
-            submit_button = st.form_submit_button("حفظ الإجابات")
-            
-            if submit_button:
-                # Validate merchant name
-                if not merchant_name:
-                    st.error("يرجى إدخال اسم التاجر")
-                else:
-                    # Get latest location data from session state
-                    lat = st.session_state.get('latitude', latitude)
-                    lng = st.session_state.get('longitude', longitude)
-                    
-                    # Save to database
-                    response_id = save_survey(selected_category, merchant_name, answers, lat, lng)
-                    
-                    if response_id:
-                        st.success(f"تم حفظ الإجابات بنجاح في قاعدة البيانات برقم: {response_id}")
-                        
-                        # Display the answers
-                        st.subheader("الإجابات المقدمة:")
-                        st.write(f"**اسم التاجر:** {merchant_name}")
-                        
-                        # Display location if available
-                        if lat and lng:
-                            st.write(f"**الموقع:** خط العرض: {lat}, خط الطول: {lng}")
-                            
-                            # Display map if coordinates are available
-                            st.map(pd.DataFrame({'lat': [float(lat)], 'lon': [float(lng)]}))
-                        
-                        for question, answer in answers.items():
-                            st.write(f"**{question}:** {answer}")
-                        
-                        # Create download links for this survey
-                        st.subheader("تحميل هذا الاستبيان:")
-                        
-                        # Prepare data
-                        response_data = {
-                            "id": response_id,
-                            "category": selected_category,
-                            "merchant_name": merchant_name,
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "latitude": lat,
-                            "longitude": lng,
-                            "answers": answers
-                        }
-                        
-                        # Create JSON download
-                        json_filename = f"survey_{response_id}_{selected_category.replace(' ', '_')}.json"
-                        json_link = create_json_download_link(response_data, json_filename, "تحميل كملف JSON")
-                        st.markdown(json_link, unsafe_allow_html=True)
-                        
-                        # Create Excel download
-                        df = pd.DataFrame(
-                            [[response_id, selected_category, merchant_name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), lat, lng]], 
-                            columns=["ID", "الفئة", "اسم التاجر", "التاريخ والوقت", "خط العرض", "خط الطول"]
-                        )
-                        # Add answers as columns
-                        for question, answer in answers.items():
-                            df[question] = answer
-                        
-                        excel_filename = f"survey_{response_id}_{selected_category.replace(' ', '_')}.xlsx"
-                        excel_link = create_excel_download_link(df, excel_filename, "تحميل كملف Excel")
-                        st.markdown(excel_link, unsafe_allow_html=True)
-                    else:
-                        st.error("حدث خطأ أثناء حفظ الإجابات. يرجى المحاولة مرة أخرى.")
+        render_survey(selected_category_data, merchant_name)
     else:
         st.error("لم يتم العثور على الفئة المحددة.")
 
@@ -586,31 +880,33 @@ elif page == "عرض النتائج السابقة":
     st.title("نتائج الاستبيانات السابقة")
     
     # Get recent responses
-    recent_responses = get_recent_responses(20)
+    data_version = get_data_version()
+    try:
+        recent_responses = load_recent_responses(20, data_version)
+    except DatabaseReadError:
+        # The failed read has already shown its error; carry on with no rows
+        recent_responses = None
     
-    if not recent_responses:
+    if recent_responses is None or recent_responses.empty:
         st.info("لا توجد استبيانات سابقة.")
     else:
         st.write(f"عدد الاستبيانات المحفوظة: {len(recent_responses)}")
         
         # Create a table of recent responses
         st.subheader("الاستبيانات الأخيرة")
-        response_data = {
-            "ID": [r["id"] for r in recent_responses],
-            "الفئة": [r["category"] for r in recent_responses],
-            "اسم التاجر": [r["merchant_name"] for r in recent_responses],
-            "التاريخ والوقت": [r["timestamp"] for r in recent_responses],
-            "خط العرض": [r["latitude"] for r in recent_responses],
-            "خط الطول": [r["longitude"] for r in recent_responses]
-        }
-        st.dataframe(response_data, width=800)
+        st.dataframe(recent_responses.rename(columns=DISPLAY_COLUMNS), width=800)
         
         # Allow viewing a specific response
         st.subheader("عرض تفاصيل استبيان")
         response_id = st.number_input("أدخل رقم الاستبيان للعرض", min_value=1, step=1)
         
         if st.button("عرض التفاصيل"):
-            response_details = get_response_details(response_id)
+            try:
+                response_details = load_response_details(response_id, data_version)
+            except DatabaseReadError:
+                # The failed read has already shown its error
+                response_details = None
+            
             if response_details:
                 col1, col2 = st.columns(2)
                 
@@ -633,151 +929,165 @@ elif page == "عرض النتائج السابقة":
                     # Download options for this response
                     st.write("**تحميل هذا الاستبيان:**")
                     
+                    # Filename stem shared by both downloads
+                    file_stem = f"survey_{response_id}_{response_details['category'].replace(' ', '_')}"
+                    
                     # JSON download
-                    json_filename = f"survey_{response_id}_{response_details['category'].replace(' ', '_')}.json"
-                    json_link = create_json_download_link(response_details, json_filename, "تحميل كملف JSON")
-                    st.markdown(json_link, unsafe_allow_html=True)
+                    json_filename = f"{file_stem}.json"
+                    json_download_button(response_details, json_filename, "تحميل كملف JSON")
                     
                     # Create dataframe for Excel
-                    df = pd.DataFrame(
-                        [[
-                            response_id, 
-                            response_details['category'], 
-                            response_details['merchant_name'], 
-                            response_details['timestamp'],
-                            response_details['latitude'],
-                            response_details['longitude']
-                        ]], 
-                        columns=["ID", "الفئة", "اسم التاجر", "التاريخ والوقت", "خط العرض", "خط الطول"]
-                    )
-                    # Add answers as columns
-                    for question, answer in response_details['answers'].items():
-                        df[question] = answer
+                    df = response_dataframe(response_details)
                     
                     # Excel download
-                    excel_filename = f"survey_{response_id}_{response_details['category'].replace(' ', '_')}.xlsx"
-                    excel_link = create_excel_download_link(df, excel_filename, "تحميل كملف Excel")
-                    st.markdown(excel_link, unsafe_allow_html=True)
+                    excel_filename = f"{file_stem}.xlsx"
+                    excel_download_button(df, excel_filename, "تحميل كملف Excel")
                 
                 st.subheader("الإجابات:")
-                for question, answer in response_details["answers"].items():
-                    st.write(f"**{question}:** {answer}")
-            else:
+                st.markdown("\n\n".join(f"**{question}:** {answer}" for question, answer in response_details["answers"].items()))
+            elif response_details is not None:
                 st.error(f"لم يتم العثور على استبيان برقم {response_id}")
 
 # Download Page
 elif page == "تحميل البيانات":
     st.title("تحميل بيانات الاستبيانات")
     
-    # Get all data
-    all_data = get_all_survey_data()
+    # The version already carries the response count, so the full data is only
+    # read when an export is actually built
+    data_version = get_data_version()
+    response_count = data_version[0]
     
-    if not all_data:
+    if not response_count:
         st.info("لا توجد بيانات للتحميل.")
     else:
-        st.write(f"إجمالي عدد الاستبيانات: {len(all_data)}")
+        st.write(f"إجمالي عدد الاستبيانات: {response_count}")
         
         st.subheader("تحميل جميع البيانات")
         
         # Format selection
         format_option = st.radio(
             "اختر صيغة التحميل:",
-            ["Excel (ملف واحد)", "CSV (ملف واحد)", "JSON (ملف واحد)"]
+            ["Excel (ملف واحد)", "CSV (ملف واحد)", "JSON (ملف واحد)", "Parquet (ملف واحد)", "Feather (ملف واحد)"]
         )
         
         # Create timestamp for filenames
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         if format_option == "Excel (ملف واحد)":
-            # Create a flattened dataframe
-            df = prepare_survey_dataframe(all_data)
-            
-            # Create the download link
+            # The workbook is streamed from SQLite in chunks when the button is clicked
             excel_filename = f"all_surveys_{timestamp}.xlsx"
-            excel_link = create_excel_download_link(df, excel_filename, "تحميل جميع البيانات كملف Excel")
-            st.markdown(excel_link, unsafe_allow_html=True)
+            st.download_button("📥 تحميل جميع البيانات كملف Excel", lambda: load_survey_excel(data_version), file_name=excel_filename, mime=EXCEL_MIME, on_click="ignore")
             
         elif format_option == "CSV (ملف واحد)":
-            # Create a flattened dataframe
-            df = prepare_survey_dataframe(all_data)
-            
-            # Create the download link
+            # The CSV is streamed from SQLite in chunks when the button is clicked
             csv_filename = f"all_surveys_{timestamp}.csv"
-            csv_link = create_download_link(df, csv_filename, "تحميل جميع البيانات كملف CSV")
-            st.markdown(csv_link, unsafe_allow_html=True)
+            st.download_button("📥 تحميل جميع البيانات كملف CSV", lambda: load_survey_csv(data_version), file_name=csv_filename, mime="text/csv", on_click="ignore")
+            
+        elif format_option == "Parquet (ملف واحد)":
+            # The flattened dataframe is loaded from SQLite when the button is clicked
+            parquet_filename = f"all_surveys_{timestamp}.parquet"
+            st.download_button("📥 تحميل جميع البيانات كملف Parquet", lambda: load_survey_dataframe(data_version).to_parquet(index=False, compression="zstd"), file_name=parquet_filename, mime="application/vnd.apache.parquet", on_click="ignore")
+            
+        elif format_option == "Feather (ملف واحد)":
+            # Same flattened dataframe as Parquet, in Arrow's fast-loading format
+            feather_filename = f"all_surveys_{timestamp}.feather"
+            st.download_button("📥 تحميل جميع البيانات كملف Feather", lambda: feather_bytes(load_survey_dataframe(data_version)), file_name=feather_filename, mime="application/vnd.apache.arrow.file", on_click="ignore")
             
         else:  # JSON
-            # Create the download link
+            # The responses are read and serialized when the button is clicked
             json_filename = f"all_surveys_{timestamp}.json"
-            json_link = create_json_download_link(all_data, json_filename, "تحميل جميع البيانات كملف JSON")
-            st.markdown(json_link, unsafe_allow_html=True)
+            st.download_button("📥 تحميل جميع البيانات كملف JSON", lambda: load_survey_json(data_version), file_name=json_filename, mime="application/json", on_click="ignore")
         
         # Filter options
         st.subheader("تصفية البيانات حسب الفئة")
         
         # Get unique categories
-        unique_categories = list(set(item["category"] for item in all_data))
+        try:
+            unique_categories = load_survey_categories(data_version)
+        except DatabaseReadError:
+            unique_categories = []
         
         selected_category = st.selectbox(
             "اختر الفئة للتحميل",
             unique_categories
         )
         
-        # Filter data by category
-        filtered_data = [item for item in all_data if item["category"] == selected_category]
+        # Load only the selected category's data; without a selection there is nothing to load
+        try:
+            filtered_data = load_all_survey_data(data_version, selected_category) if selected_category else []
+        except DatabaseReadError:
+            filtered_data = []
         
         if filtered_data:
             st.write(f"عدد الاستبيانات في الفئة '{selected_category}': {len(filtered_data)}")
             
-            # Create download links for filtered data
-            df_filtered = prepare_survey_dataframe(filtered_data)
+            # Create download buttons for filtered data
+            df_filtered = load_filtered_dataframe(data_version, selected_category)
+            category_stem = f"{selected_category.replace(' ', '_')}_{timestamp}"
             
             # Excel download
-            excel_filename = f"{selected_category.replace(' ', '_')}_{timestamp}.xlsx"
-            excel_link = create_excel_download_link(df_filtered, excel_filename, f"تحميل بيانات '{selected_category}' كملف Excel")
-            st.markdown(excel_link, unsafe_allow_html=True)
+            excel_filename = f"{category_stem}.xlsx"
+            excel_download_button(df_filtered, excel_filename, f"تحميل بيانات '{selected_category}' كملف Excel")
             
             # CSV download
-            csv_filename = f"{selected_category.replace(' ', '_')}_{timestamp}.csv"
-            csv_link = create_download_link(df_filtered, csv_filename, f"تحميل بيانات '{selected_category}' كملف CSV")
-            st.markdown(csv_link, unsafe_allow_html=True)
+            csv_filename = f"{category_stem}.csv"
+            csv_download_button(df_filtered, csv_filename, f"تحميل بيانات '{selected_category}' كملف CSV")
             
             # JSON download
-            json_filename = f"{selected_category.replace(' ', '_')}_{timestamp}.json"
-            json_link = create_json_download_link(filtered_data, json_filename, f"تحميل بيانات '{selected_category}' كملف JSON")
-            st.markdown(json_link, unsafe_allow_html=True)
+            json_filename = f"{category_stem}.json"
+            json_download_button(filtered_data, json_filename, f"تحميل بيانات '{selected_category}' كملف JSON")
+            
+            # Parquet download
+            parquet_filename = f"{category_stem}.parquet"
+            parquet_download_button(df_filtered, parquet_filename, f"تحميل بيانات '{selected_category}' كملف Parquet")
+            
+            # Feather download
+            feather_filename = f"{category_stem}.feather"
+            feather_download_button(df_filtered, feather_filename, f"تحميل بيانات '{selected_category}' كملف Feather")
             
         # Filter options by merchant name
         st.subheader("تصفية البيانات حسب اسم التاجر")
         
         # Get unique merchant names
-        unique_merchants = list(set(item["merchant_name"] for item in all_data))
+        try:
+            unique_merchants = load_survey_merchants(data_version)
+        except DatabaseReadError:
+            unique_merchants = []
         
         selected_merchant = st.selectbox(
             "اختر اسم التاجر للتحميل",
             unique_merchants
         )
         
-        # Filter data by merchant name
-        filtered_by_merchant = [item for item in all_data if item["merchant_name"] == selected_merchant]
+        # Load only the selected merchant's data; without a selection there is nothing to load
+        try:
+            filtered_by_merchant = load_all_survey_data(data_version, merchant_name=selected_merchant) if selected_merchant else []
+        except DatabaseReadError:
+            filtered_by_merchant = []
         
         if filtered_by_merchant:
             st.write(f"عدد الاستبيانات للتاجر '{selected_merchant}': {len(filtered_by_merchant)}")
             
-            # Create download links for filtered data
-            df_filtered_merchant = prepare_survey_dataframe(filtered_by_merchant)
+            # Create download buttons for filtered data
+            df_filtered_merchant = load_filtered_dataframe(data_version, merchant_name=selected_merchant)
+            merchant_stem = f"merchant_{selected_merchant.replace(' ', '_')}_{timestamp}"
             
             # Excel download
-            excel_filename = f"merchant_{selected_merchant.replace(' ', '_')}_{timestamp}.xlsx"
-            excel_link = create_excel_download_link(df_filtered_merchant, excel_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف Excel")
-            st.markdown(excel_link, unsafe_allow_html=True)
+            excel_filename = f"{merchant_stem}.xlsx"
+            excel_download_button(df_filtered_merchant, excel_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف Excel")
             
             # CSV download
-            csv_filename = f"merchant_{selected_merchant.replace(' ', '_')}_{timestamp}.csv"
-            csv_link = create_download_link(df_filtered_merchant, csv_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف CSV")
-            st.markdown(csv_link, unsafe_allow_html=True)
+            csv_filename = f"{merchant_stem}.csv"
+            csv_download_button(df_filtered_merchant, csv_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف CSV")
             
             # JSON download
-            json_filename = f"merchant_{selected_merchant.replace(' ', '_')}_{timestamp}.json"
-            json_link = create_json_download_link(filtered_by_merchant, json_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف JSON")
-            st.markdown(json_link, unsafe_allow_html=True)
\ No newline at end of file
+            json_filename = f"{merchant_stem}.json"
+            json_download_button(filtered_by_merchant, json_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف JSON")
+            
+            # Parquet download
+            parquet_filename = f"{merchant_stem}.parquet"
+            parquet_download_button(df_filtered_merchant, parquet_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف Parquet")
+            
+            # Feather download
+            feather_filename = f"{merchant_stem}.feather"
+            feather_download_button(df_filtered_merchant, feather_filename, f"تحميل بيانات التاجر '{selected_merchant}' كملف Feather")
\ No newline at end of file
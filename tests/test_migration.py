@@ -0,0 +1,154 @@
+import ast
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Schema as it was before timestamps moved to INTEGER epoch seconds
+LEGACY_SCHEMA_SQL = '''
+CREATE TABLE survey_responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category TEXT NOT NULL,
+    merchant_name TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    latitude TEXT,
+    longitude TEXT
+);
+CREATE TABLE survey_answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    response_id INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    FOREIGN KEY (response_id) REFERENCES survey_responses (id)
+);
+'''
+
+
+def migration_statements():
+    """The app's MIGRATE_TIMESTAMP_SQL statements, read from its source without running it"""
+    with open(os.path.join(REPO_DIR, "app.py"), encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and node.targets[0].id == "MIGRATE_TIMESTAMP_SQL":
+            return ast.literal_eval(node.value).split(";")
+    raise AssertionError("MIGRATE_TIMESTAMP_SQL not found in app.py")
+
+
+def local_epoch(text):
+    """Epoch seconds for a local-time 'YYYY-MM-DD HH:MM:SS' string"""
+    return int(datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp())
+
+
+class TimestampMigrationTest(unittest.TestCase):
+    """Run the app against a legacy database and check what the rebuild leaves behind"""
+
+    def setUp(self):
+        # The pool and init_database are process-wide caches; start each test from scratch
+        st.cache_resource.clear()
+        st.cache_data.clear()
+
+        self.app_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.app_dir)
+        shutil.copy(os.path.join(REPO_DIR, "app.py"), self.app_dir)
+        shutil.copy(os.path.join(REPO_DIR, "data.json"), self.app_dir)
+        shutil.copytree(os.path.join(REPO_DIR, "frontend"), os.path.join(self.app_dir, "frontend"))
+        self.db_path = os.path.join(self.app_dir, "survey_data.db")
+
+    def run_app(self):
+        """Run the app once from its temp directory, which triggers the migration"""
+        cwd = os.getcwd()
+        os.chdir(self.app_dir)
+        try:
+            at = AppTest.from_file(os.path.join(self.app_dir, "app.py"), default_timeout=60).run()
+        finally:
+            os.chdir(cwd)
+            # Release the pooled connections so the database can be inspected and removed
+            st.cache_resource.clear()
+        self.assertFalse(at.exception)
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_rebuild_keeps_ids_timestamps_and_sequence(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(LEGACY_SCHEMA_SQL)
+        conn.executemany(
+            "INSERT INTO survey_responses (category, merchant_name, timestamp) VALUES (?, ?, ?)",
+            [("A", "m1", "2024-01-02 03:04:05"), ("B", "m2", "2024-06-30 23:59:59"), ("C", "m3", "2024-07-01 00:00:00")]
+        )
+        # Deleting the newest response leaves the counter above the highest surviving id
+        conn.execute("DELETE FROM survey_responses WHERE id = 3")
+        conn.commit()
+        conn.close()
+
+        self.run_app()
+
+        columns = {col[1]: col[2] for col in self.query("PRAGMA table_info(survey_responses)")}
+        self.assertEqual(columns["timestamp"], "INTEGER")
+        self.assertEqual(
+            self.query("SELECT id, timestamp FROM survey_responses ORDER BY id"),
+            [(1, local_epoch("2024-01-02 03:04:05")), (2, local_epoch("2024-06-30 23:59:59"))]
+        )
+        self.assertEqual(self.query("SELECT seq FROM sqlite_sequence WHERE name = 'survey_responses'"), [(3,)])
+
+        # The next response must not get the deleted response's id
+        conn = sqlite3.connect(self.db_path)
+        new_id = conn.execute(
+            "INSERT INTO survey_responses (category, merchant_name, timestamp) VALUES ('D', 'm4', 0)"
+        ).lastrowid
+        conn.commit()
+        conn.close()
+        self.assertEqual(new_id, 4)
+
+    def test_replayed_rebuild_keeps_epochs(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(LEGACY_SCHEMA_SQL)
+        conn.execute(
+            "INSERT INTO survey_responses (category, merchant_name, timestamp) VALUES ('A', 'm1', '2024-01-02 03:04:05')"
+        )
+        conn.commit()
+        conn.close()
+
+        self.run_app()
+        migrated = self.query("SELECT id, timestamp FROM survey_responses")
+        seq = self.query("SELECT seq FROM sqlite_sequence WHERE name = 'survey_responses'")
+
+        # A second process that saw TEXT before the first one migrated replays the rebuild
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        for statement in migration_statements():
+            conn.execute(statement)
+        conn.execute("COMMIT")
+        conn.close()
+
+        self.assertEqual(migrated, [(1, local_epoch("2024-01-02 03:04:05"))])
+        self.assertEqual(self.query("SELECT id, timestamp FROM survey_responses"), migrated)
+        self.assertEqual(self.query("SELECT seq FROM sqlite_sequence WHERE name = 'survey_responses'"), seq)
+
+    def test_rebuild_of_shipped_database(self):
+        shutil.copy(os.path.join(REPO_DIR, "survey_data.db"), self.db_path)
+        before = self.query("SELECT id, timestamp FROM survey_responses ORDER BY id")
+        seq = self.query("SELECT seq FROM sqlite_sequence WHERE name = 'survey_responses'")
+
+        self.run_app()
+
+        self.assertEqual(
+            self.query("SELECT id, timestamp FROM survey_responses ORDER BY id"),
+            [(row_id, local_epoch(timestamp)) for row_id, timestamp in before]
+        )
+        self.assertEqual(self.query("SELECT seq FROM sqlite_sequence WHERE name = 'survey_responses'"), seq)
+
+
+if __name__ == "__main__":
+    unittest.main()